@@ -0,0 +1,117 @@
+from functools import lru_cache
+
+import holidays
+import numpy as np
+import pandas as pd
+
+DAYS_PER_YEAR = 365.25
+
+
+@lru_cache(maxsize=None)
+def _holiday_days(first_year, last_year):
+    # Holiday calendars are slow to expand, so cache them per year range
+    calendar = holidays.IN(years=range(first_year, last_year + 1))
+    return pd.DatetimeIndex(sorted(calendar.keys())).values.astype("datetime64[D]")
+
+
+def holiday_indicator(dates):
+    """1.0 for every date that is an Indian public holiday, else 0.0."""
+    dates = pd.DatetimeIndex(dates)
+    days = _holiday_days(int(dates.year.min()), int(dates.year.max()))
+    return np.isin(dates.values.astype("datetime64[D]"), days).astype(np.float64)
+
+
+def design_matrix(dates, origin, fourier_order=10):
+    """
+    Build the regression design matrix for a set of dates.
+
+    Columns: intercept, linear trend (in years since origin), yearly Fourier
+    terms sin/cos(2*pi*k*t) for k = 1..fourier_order, six weekday dummies
+    (Monday is the baseline) and the Indian holiday indicator.
+
+    :param dates: DatetimeIndex of observation or forecast dates
+    :param origin: Timestamp at which the trend is zero
+    :param fourier_order: Number of yearly harmonics
+    :return: 2-D float array of shape (len(dates), 2 + 2 * fourier_order + 7)
+    """
+    dates = pd.DatetimeIndex(dates)
+    t = ((dates - pd.Timestamp(origin)) / pd.Timedelta(days=1)).values / DAYS_PER_YEAR
+
+    # Fourier terms for all harmonics at once
+    angles = 2 * np.pi * np.outer(t, np.arange(1, fourier_order + 1))
+    weekday_dummies = dates.dayofweek.values[:, None] == np.arange(1, 7)[None, :]
+
+    return np.column_stack(
+        [
+            np.ones(len(dates)),
+            t,
+            np.sin(angles),
+            np.cos(angles),
+            weekday_dummies.astype(np.float64),
+            holiday_indicator(dates),
+        ]
+    )
+
+
+class CalendarRegression:
+    def __init__(self, fourier_order=10, log=True):
+        """
+        Linear regression on trend, yearly Fourier seasonality, weekday dummies
+        and Indian holidays, solved with a single least-squares call
+
+        :param fourier_order: Number of yearly harmonics
+        :param log: Fit log(sales) so seasonal, weekday and holiday effects are
+                    multiplicative; ignored if the data is not strictly positive
+        """
+        self.fourier_order = fourier_order
+        self.log = log
+
+    def fit(self, data):
+        """
+        Fit one or many series observed on the same dates.
+
+        :param data: pd.Series, or pd.DataFrame with one series per column
+        """
+        values = data.to_numpy(dtype=np.float64)
+        self.batched = values.ndim == 2
+        self.columns = data.columns if self.batched else None
+        self.name = None if self.batched else data.name
+        self.last_date = data.index[-1]
+        self.freq = pd.infer_freq(data.index) if len(data) >= 3 else None
+        self.origin = data.index[0]
+        self.use_log = self.log and bool(np.all(values > 0))
+        # Yearly harmonics are unidentified when the data only covers part of
+        # the year (e.g. every March), and would extrapolate wildly
+        self.order = self.fourier_order if data.index.month.nunique() == 12 else 0
+
+        y = np.log(values) if self.use_log else values
+        X = design_matrix(data.index, self.origin, self.order)
+        # One solve for every series: lstsq accepts a matrix of right-hand sides
+        self.coef, *_ = np.linalg.lstsq(X, y, rcond=None)
+        self.fitted = X @ self.coef
+        if self.use_log:
+            self.fitted = np.exp(self.fitted)
+        return self
+
+    def forecast(self, steps=None, dates=None):
+        """
+        Forecast the fitted series.
+
+        :param steps: Number of periods after the last observed date, at the
+                      inferred frequency of the data (daily if none)
+        :param dates: Explicit forecast dates, instead of steps
+        :return: pd.Series, or pd.DataFrame for batched fits
+        """
+        if dates is None:
+            dates = pd.date_range(
+                start=self.last_date, periods=steps + 1, freq=self.freq or "D"
+            )[1:]
+        dates = pd.DatetimeIndex(dates)
+
+        prediction = design_matrix(dates, self.origin, self.order) @ self.coef
+        if self.use_log:
+            prediction = np.exp(prediction)
+
+        if self.batched:
+            return pd.DataFrame(prediction, index=dates, columns=self.columns)
+        return pd.Series(prediction, index=dates, name=self.name)
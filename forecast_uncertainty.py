@@ -0,0 +1,164 @@
+import numpy as np
+import pandas as pd
+from numpy.polynomial import polynomial as P
+from scipy.signal import lfilter
+
+QUANTILES = (0.05, 0.5, 0.95)
+# Upper bound on simulated values held in memory at once (~32 MB of float64)
+MAX_SIMULATED_VALUES = 4_000_000
+
+# Forecast errors that do not build up (e.g. deterministic regressions)
+IID_FILTER = (np.array([1.0]), np.array([1.0]))
+
+
+def ses_error_filter(alpha):
+    """
+    Error filter of simple exponential smoothing: a shock moves the level by
+    alpha for every later step, psi = 1, alpha, alpha, ...
+    """
+    return np.array([1.0, alpha - 1.0]), np.array([1.0, -1.0])
+
+
+def holt_winters_error_filter(alpha, beta, gamma, seasonal_periods):
+    """
+    Error filter of additive Holt-Winters, psi_j = alpha * (1 + j * beta)
+    + gamma * [j is a multiple of the season], written as a rational filter
+    so the recursion only keeps (seasonal_periods + 2) values of state.
+    """
+    one_minus_l = np.array([1.0, -1.0])
+    lag = np.array([0.0, 1.0])
+    denominator = P.polymul(one_minus_l, one_minus_l)
+    season = np.zeros(seasonal_periods + 1)
+    season[0], season[-1] = 1.0, -1.0
+    if gamma > 0:
+        denominator = P.polymul(denominator, season)
+    else:
+        season = np.array([1.0])
+
+    numerator = denominator
+    numerator = P.polyadd(numerator, alpha * P.polymul(P.polymul(lag, one_minus_l), season))
+    numerator = P.polyadd(numerator, alpha * beta * P.polymul(lag, season))
+    if gamma > 0:
+        lag_m = np.zeros(seasonal_periods + 1)
+        lag_m[-1] = 1.0
+        numerator = P.polyadd(
+            numerator, gamma * P.polymul(lag_m, P.polymul(one_minus_l, one_minus_l))
+        )
+    return numerator, denominator
+
+
+def arima_error_filter(polynomial_ar, polynomial_ma, k_diff):
+    """Error filter of an ARIMA model: theta(L) / (phi(L) * (1 - L)^d)."""
+    denominator = np.asarray(polynomial_ar, dtype=np.float64)
+    for _ in range(k_diff):
+        denominator = P.polymul(denominator, [1.0, -1.0])
+    return np.asarray(polynomial_ma, dtype=np.float64), denominator
+
+
+def inverse_mse_weights(errors):
+    """
+    Ensemble weights proportional to 1 / MSE. Methods without a test error
+    get the mean weight of the others, or all methods equal weights if none have one.
+    Methods with a test MSE of exactly 0 share all the weight.
+
+    :param errors: Dict method -> test MSE (or None)
+    :return: Dict method -> weight, summing to 1
+    """
+    perfect = [m for m, e in errors.items() if e == 0]
+    if perfect:
+        # 1 / MSE is infinite, so these methods outweigh every other one
+        return {m: 1.0 / len(perfect) if m in perfect else 0.0 for m in errors}
+    inverse = {m: 1.0 / e for m, e in errors.items() if e is not None and e > 0}
+    fallback = np.mean(list(inverse.values())) if inverse else 1.0
+    raw = {m: inverse.get(m, fallback) for m in errors}
+    total = sum(raw.values())
+    return {m: w / total for m, w in raw.items()}
+
+
+def simulate_intervals(
+    forecasts,
+    residuals,
+    weights,
+    error_filters=None,
+    n_paths=2000,
+    quantiles=QUANTILES,
+    seed=42,
+    max_values=MAX_SIMULATED_VALUES,
+):
+    """
+    Residual-bootstrap prediction intervals for several forecasts and their
+    weighted ensemble.
+
+    Every sample path draws in-sample residuals with replacement as future
+    innovations and feeds them through each method's error recursion, given
+    as an (numerator, denominator) linear filter, so errors build up over the
+    horizon as they do in the model. The same draw indices are shared by all
+    methods, so the ensemble paths keep the correlation between methods.
+
+    The horizon is simulated in chunks, with the filter state carried across
+    chunk boundaries, so the result does not depend on the chunk size. Chunks
+    are sized so the temporaries of one chunk (draw indices, innovations,
+    filtered errors, stacked paths and the sorted copy made by np.quantile)
+    stay within max_values numbers. The carried filter state adds n_paths
+    values per filter order of each method.
+
+    :param forecasts: Dict method -> point forecast (array-like, same horizon)
+    :param residuals: Dict method -> in-sample one-step residuals
+    :param weights: Dict method -> ensemble weight
+    :param error_filters: Dict method -> (b, a) filter coefficients in powers
+                          of the lag operator; IID_FILTER for missing methods
+    :param n_paths: Number of simulated sample paths
+    :param quantiles: Quantile levels to compute
+    :param seed: Random seed for reproducible intervals
+    :param max_values: Memory bound, in simulated values per chunk
+    :return: Tuple (ensemble, intervals) where ensemble is the weighted point
+             forecast and intervals maps each method plus "Ensemble" to an
+             array of shape (len(quantiles), horizon)
+    """
+    error_filters = error_filters or {}
+    methods = list(forecasts)
+    F = np.vstack([np.asarray(forecasts[m], dtype=np.float64) for m in methods])
+    w = np.array([weights[m] for m in methods])
+    filters = [error_filters.get(m, IID_FILTER) for m in methods]
+
+    # Residual series may differ slightly in length; align on the most recent
+    n_resid = min(len(residuals[m]) for m in methods)
+    R = np.vstack([np.asarray(residuals[m], dtype=np.float64)[-n_resid:] for m in methods])
+
+    horizon = F.shape[1]
+    n_series = len(methods) + 1
+    # Draw indices, innovations and filtered errors of one method, plus the
+    # stacked paths and np.quantile's sorted copy of them
+    values_per_step = (2 * n_series + 3) * n_paths
+    chunk = max(1, max_values // values_per_step)
+    rng = np.random.default_rng(seed)
+    out = np.empty((n_series, len(quantiles), horizon))
+    state = [np.zeros((n_paths, max(len(b), len(a)) - 1)) for b, a in filters]
+
+    for start in range(0, horizon, chunk):
+        stop = min(start + chunk, horizon)
+        # Drawn step by step, so the random stream is the same for any chunk size
+        draws = rng.integers(0, n_resid, size=(stop - start, n_paths)).T
+        # (series, paths, steps): forecast plus accumulated bootstrap errors
+        all_paths = np.empty((n_series, n_paths, stop - start))
+        for i, (b, a) in enumerate(filters):
+            innovations = R[i][draws]
+            if state[i].shape[1]:
+                errors, state[i] = lfilter(b, a, innovations, axis=-1, zi=state[i])
+            else:
+                errors = innovations * (b[0] / a[0])
+            all_paths[i] = F[i, start:stop] + errors
+        all_paths[-1] = np.tensordot(w, all_paths[:-1], axes=1)
+        out[:, :, start:stop] = np.moveaxis(np.quantile(all_paths, quantiles, axis=1), 0, 1)
+
+    intervals = dict(zip(methods + ["Ensemble"], out))
+    return w @ F, intervals
+
+
+def intervals_to_frame(intervals, index, quantiles=QUANTILES):
+    """Flatten interval arrays into columns like 'ARIMA q05', 'Ensemble q95'."""
+    columns = {}
+    for method, values in intervals.items():
+        for q, row in zip(quantiles, values):
+            columns[f"{method} q{round(q * 100):02d}"] = row
+    return pd.DataFrame(columns, index=index)
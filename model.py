@@ -7,6 +7,16 @@ from statsmodels.tsa.holtwinters import ExponentialSmoothing
 from statsmodels.tsa.arima.model import ARIMA
 import warnings
 
+from calendar_regression import CalendarRegression
+from forecast_uncertainty import (
+    arima_error_filter,
+    holt_winters_error_filter,
+    inverse_mse_weights,
+    intervals_to_frame,
+    ses_error_filter,
+    simulate_intervals,
+)
+
 
 class TimeSeriesSalesPrediction:
     def __init__(self, data_path):
@@ -24,6 +34,9 @@ class TimeSeriesSalesPrediction:
         os.makedirs("output_predictions", exist_ok=True)
         os.makedirs("output_predictions/csv", exist_ok=True)
 
+        # Prediction intervals per granularity, filled by predict_time_series
+        self.prediction_intervals = {}
+
         # Load data
         self.df = pd.read_csv(data_path)
         self.df["Date"] = pd.to_datetime(self.df["Date"])
@@ -58,13 +71,20 @@ class TimeSeriesSalesPrediction:
         train_size = int(len(data) * 0.8)
         train, test = data[:train_size], data[train_size:]
 
-        # Prediction methods
+        # Prediction methods, their in-sample fitted values and the filters
+        # that carry a forecast error into later steps
         prediction_results = {}
+        fitted_values = {}
+        error_filters = {}
 
         # 1. Simple Exponential Smoothing
         model_ses = ExponentialSmoothing(train, trend=None, seasonal=None).fit()
         ses_forecast = model_ses.forecast(steps=pred_periods)
         prediction_results["Simple Exponential Smoothing"] = ses_forecast
+        fitted_values["Simple Exponential Smoothing"] = model_ses.fittedvalues
+        error_filters["Simple Exponential Smoothing"] = ses_error_filter(
+            model_ses.params["smoothing_level"]
+        )
 
         # 2. Holt-Winters Exponential Smoothing (Seasonal)
         try:
@@ -73,6 +93,13 @@ class TimeSeriesSalesPrediction:
             ).fit()
             hw_forecast = model_hw.forecast(steps=pred_periods)
             prediction_results["Holt-Winters"] = hw_forecast
+            fitted_values["Holt-Winters"] = model_hw.fittedvalues
+            error_filters["Holt-Winters"] = holt_winters_error_filter(
+                model_hw.params["smoothing_level"],
+                model_hw.params["smoothing_trend"],
+                model_hw.params["smoothing_seasonal"],
+                model_hw.model.seasonal_periods,
+            )
         except:
             pass
 
@@ -81,9 +108,32 @@ class TimeSeriesSalesPrediction:
             model_arima = ARIMA(train, order=(5, 1, 0)).fit()
             arima_forecast = model_arima.forecast(steps=pred_periods)
             prediction_results["ARIMA"] = arima_forecast
+            fitted_values["ARIMA"] = model_arima.fittedvalues
+            error_filters["ARIMA"] = arima_error_filter(
+                model_arima.polynomial_ar,
+                model_arima.polynomial_ma,
+                model_arima.model.k_diff,
+            )
         except:
             pass
 
+        # 4. Calendar Regression (trend, Fourier seasonality, weekday, holidays)
+        try:
+            model_reg = CalendarRegression().fit(train)
+            reg_forecast = model_reg.forecast(steps=pred_periods)
+            # Share the index of the other forecasts so CSV columns line up
+            prediction_results["Calendar Regression"] = pd.Series(
+                reg_forecast.values, index=ses_forecast.index
+            )
+            fitted_values["Calendar Regression"] = model_reg.fitted
+        except:
+            pass
+
+        # 5. Weighted ensemble with residual-bootstrap prediction intervals
+        self.prediction_intervals[granularity] = self.simulate_uncertainty(
+            prediction_results, fitted_values, error_filters, train, test
+        )
+
         # Visualization
         plt.figure(figsize=(15, 8))
 
@@ -101,6 +151,16 @@ class TimeSeriesSalesPrediction:
         for method, forecast in prediction_results.items():
             plt.plot(pred_index, forecast, label=f"{method} Prediction", linestyle="--")
 
+        intervals = self.prediction_intervals[granularity]
+        if "Ensemble q05" in intervals:
+            plt.fill_between(
+                pred_index,
+                intervals["Ensemble q05"],
+                intervals["Ensemble q95"],
+                alpha=0.2,
+                label="Ensemble 90% Interval",
+            )
+
         plt.title(f"{granularity} Time Series Prediction")
         plt.xlabel("Date")
         plt.ylabel("Sales")
@@ -117,12 +177,59 @@ class TimeSeriesSalesPrediction:
             if len(forecast) <= len(test):
                 mse = mean_squared_error(test[: len(forecast)], forecast)
                 mae = mean_absolute_error(test[: len(forecast)], forecast)
-                print(f"{method}:")
+                if method == "Ensemble":
+                    # Its weights were fitted on this test data, so the score is optimistic
+                    print(f"{method} (in-sample, weighted on the test data):")
+                else:
+                    print(f"{method}:")
                 print(f"  Mean Squared Error: {mse:.2f}")
                 print(f"  Mean Absolute Error: {mae:.2f}")
 
         return prediction_results
 
+    def simulate_uncertainty(
+        self, prediction_results, fitted_values, error_filters, train, test, n_paths=2000
+    ):
+        """
+        Add an inverse-MSE weighted "Ensemble" forecast to prediction_results
+        and simulate prediction intervals for every method
+
+        :param prediction_results: Point forecasts per method (updated in place)
+        :param fitted_values: In-sample fitted values per method
+        :param error_filters: Error recursion per method, see simulate_intervals
+        :param train: Training data the methods were fitted on
+        :param test: Held-out data used to weight the methods
+        :param n_paths: Number of bootstrap sample paths per method
+        :return: DataFrame of quantile columns, e.g. "ARIMA q05", "Ensemble q95"
+        """
+        # Skip the first fitted values, where the models are still initialising
+        burn_in = min(10, len(train) // 10)
+        forecasts, residuals, errors = {}, {}, {}
+        for method, forecast in prediction_results.items():
+            resid = (train.values - np.asarray(fitted_values[method]))[burn_in:]
+            if not (np.all(np.isfinite(forecast)) and np.all(np.isfinite(resid))):
+                continue
+            forecasts[method] = np.asarray(forecast)
+            residuals[method] = resid
+            if len(forecast) <= len(test):
+                errors[method] = mean_squared_error(test[: len(forecast)], forecast)
+            else:
+                errors[method] = None
+
+        index = next(iter(prediction_results.values())).index
+        if not forecasts:
+            return pd.DataFrame(index=index)
+
+        ensemble, intervals = simulate_intervals(
+            forecasts,
+            residuals,
+            inverse_mse_weights(errors),
+            error_filters=error_filters,
+            n_paths=n_paths,
+        )
+        prediction_results["Ensemble"] = pd.Series(ensemble, index=index)
+        return intervals_to_frame(intervals, index)
+
     def comprehensive_prediction(self):
         """
         Perform predictions at different granularities
@@ -178,8 +285,14 @@ class TimeSeriesSalesPrediction:
             "future_yearly": future_yearly_predictions,
             "monthly": monthly_predictions,
             "future_monthly": future_monthly_predictions,
+            "intervals": self.prediction_intervals,
         }
 
+    @staticmethod
+    def primary_method(pred_dict):
+        """The ensemble forecast if available, otherwise the first method"""
+        return "Ensemble" if "Ensemble" in pred_dict else list(pred_dict.keys())[0]
+
     def visualize_predictions(self, predictions):
         """
         Create comprehensive visualizations of predictions
@@ -197,8 +310,8 @@ class TimeSeriesSalesPrediction:
             color="blue",
         )
 
-        # Overlay future predictions from first prediction method
-        first_method = list(predictions["overall"].keys())[0]
+        # Overlay future predictions from the ensemble, with its 90% interval
+        first_method = self.primary_method(predictions["overall"])
         future_index = pd.date_range(
             start=overall_data.index[-1],
             periods=len(predictions["overall"][first_method]) + 1,
@@ -211,6 +324,16 @@ class TimeSeriesSalesPrediction:
             color="red",
             linestyle="--",
         )
+        overall_intervals = predictions["intervals"]["Overall Sales"]
+        if f"{first_method} q05" in overall_intervals:
+            plt.fill_between(
+                future_index,
+                overall_intervals[f"{first_method} q05"],
+                overall_intervals[f"{first_method} q95"],
+                color="red",
+                alpha=0.2,
+                label="90% Prediction Interval",
+            )
         plt.title("Overall Sales Prediction")
         plt.xlabel("Date")
         plt.ylabel("Sales")
@@ -231,7 +354,7 @@ class TimeSeriesSalesPrediction:
         future_year_preds = []
         for year in future_years:
             pred_dict = predictions["future_yearly"][year]
-            first_method = list(pred_dict.keys())[0]  # Get first prediction method
+            first_method = self.primary_method(pred_dict)
             pred_values = pred_dict[first_method]
             future_year_preds.append(pred_values.mean())  # Use mean of predictions
 
@@ -261,7 +384,7 @@ class TimeSeriesSalesPrediction:
         future_month_preds = []
         for month in range(1, 13):
             pred_dict = predictions["future_monthly"][month]
-            first_method = list(pred_dict.keys())[0]
+            first_method = self.primary_method(pred_dict)
             pred_values = pred_dict[first_method]
             future_month_preds.append(pred_values.mean())  # Use mean of predictions
 
@@ -292,6 +415,10 @@ class TimeSeriesSalesPrediction:
         
         for method, forecast in predictions['overall'].items():
             overall_df[f'{method}'] = forecast
+        # Prediction interval quantiles, e.g. "Ensemble q05"
+        for column, values in predictions['intervals']['Overall Sales'].items():
+            # Same index as the forecasts, so rows line up by label
+            overall_df[column] = values
         overall_df.index = pred_index
         overall_df.to_csv('output_predictions/csv/overall_predictions.csv')
 
@@ -300,6 +427,9 @@ class TimeSeriesSalesPrediction:
         for year, pred_dict in predictions['future_yearly'].items():
             for method, forecast in pred_dict.items():
                 yearly_df[f'{year}_{method}'] = forecast
+            intervals = predictions['intervals'][f'Future Year {year} Sales']
+            for column, values in intervals.items():
+                yearly_df[f'{year}_{column}'] = values
         yearly_df.to_csv('output_predictions/csv/yearly_predictions.csv')
 
         # Save monthly predictions
@@ -307,6 +437,9 @@ class TimeSeriesSalesPrediction:
         for month, pred_dict in predictions['future_monthly'].items():
             for method, forecast in pred_dict.items():
                 monthly_df[f'Month_{month}_{method}'] = forecast
+            intervals = predictions['intervals'][f'Future Month {month} Sales']
+            for column, values in intervals.items():
+                monthly_df[f'Month_{month}_{column}'] = values
         monthly_df.to_csv('output_predictions/csv/monthly_predictions.csv')
 
         # Save historical data for context
@@ -1,7 +1,8 @@
-from bs4 import BeautifulSoup
 import requests
 import json
 
+from parsing import iter_stamp_blocks
+
 def scrape_stamp_data(url):
     # Fetch webpage content
     try:
@@ -12,52 +13,33 @@ def scrape_stamp_data(url):
         print(f"Error fetching webpage: {e}")
         return []
 
-    # Parse HTML
-    soup = BeautifulSoup(html_content, 'html.parser')
-    
-    # Find all table rows
-    rows = soup.find_all('tr')
-    
     # List to store all stamp data
     stamps = []
-    
-    for row in rows:
-        # Find image and data cells
-        img_cell = row.find('td', width="55%")
-        data_cell = row.find('td', width="40%")
-        
-        if not (img_cell and data_cell):
-            continue
-            
+
+    # Stream the page and only build the image/data cells of each stamp row
+    for block in iter_stamp_blocks(html_content):
         # Get image URL
-        img_tag = img_cell.find('img')
-        if img_tag:
-            # Convert relative URL to absolute URL
-            img_url = img_tag.get('src', '')
-            if img_url.startswith('images/'):
-                img_url = f"https://postagestamps.gov.in/{img_url}"
-        else:
+        img_url = block['image_url']
+        if img_url is None:
             continue
-            
+        # Convert relative URL to absolute URL
+        if img_url.startswith('images/'):
+            img_url = f"https://postagestamps.gov.in/{img_url}"
+
         # Get date and title
-        paragraphs = data_cell.find_all('p')
         date = ''
         title = ''
-        
-        for p in paragraphs:
-            text = p.get_text(strip=True)
+
+        for text, bold in block['paragraphs']:
             if 'commemorative postage stamp' in text.lower():
                 date = text.split(':')[0]
-            elif p.find('b'):
-                title = p.find('b').get_text(strip=True)
+            elif bold is not None:
+                title = bold
                 break
-                
+
         # Get denomination
-        denomination = ''
-        denom_cell = data_cell.find('td', height="25")
-        if denom_cell:
-            denomination = denom_cell.get_text(strip=True)
-            
+        denomination = block['denomination']
+
         # Only add if we have all required data
         if date and title and img_url and denomination:
             stamps.append({
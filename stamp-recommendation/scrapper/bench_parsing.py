@@ -0,0 +1,128 @@
+"""
+Benchmark the streaming parsers in parsing.py against full BeautifulSoup trees.
+
+Usage:
+    python bench_parsing.py [--yearly page.html ...] [--commemorative page.html ...]
+
+Without saved pages, synthetic pages shaped like the real ones are generated.
+Synthetic results only approximate real pages; pass saved pages for numbers
+that reflect the site's actual markup.
+"""
+import argparse
+import time
+import tracemalloc
+from itertools import islice
+
+from bs4 import BeautifulSoup
+
+from parsing import iter_stamp_blocks, iter_table_rows
+
+
+def synthetic_yearly_page(rows=2000):
+    body = ['<html><body><table><tr><th>Sl No</th><th>Name</th></tr>']
+    for i in range(rows):
+        body.append(
+            f'<tr><td>{i + 1}.</td><td>Stamp {i}</td><td>18.01.2024</td><td>500 p</td>'
+            f'<td>2,01,600</td><td>Security Printing Press, Hyderabad</td>'
+            f'<td><span class="linkToimage" imgnames="2024\\stamp {i}.jpg">View</span></td>'
+            f'<td><span class="linkToimage" imgnames="2024\\stamp {i}_FDC.jpg">View</span></td>'
+            f'<td><a href="..\\Pdf\\2024\\stamp {i}.pdf">Brochure</a></td></tr>'
+        )
+    body.append('</table></body></html>')
+    return ''.join(body)
+
+
+def synthetic_commemorative_page(rows=2000):
+    body = ['<html><body><table>']
+    for i in range(rows):
+        body.append(
+            f'<tr><td width="55%"><img src="images/stamp{i}.jpg"></td>'
+            f'<td width="40%"><p>12.03.2010 : Commemorative Postage Stamp</p>'
+            f'<p><b>Stamp {i}</b></p><table><tr><td height="25">500 p</td></tr></table></td></tr>'
+        )
+    body.append('</table></body></html>')
+    return ''.join(body)
+
+
+def soup_yearly(html):
+    table = BeautifulSoup(html, 'html.parser').find('table')
+    rows = []
+    for row in table.find_all('tr')[1:]:
+        cols = row.find_all('td')
+        if len(cols) >= 9:
+            rows.append((cols[0].text.strip(), cols[1].text.strip()))
+    return rows
+
+
+def stream_yearly(html):
+    return [
+        (cols[0]['text'].strip(), cols[1]['text'].strip())
+        for cols in islice(iter_table_rows(html), 1, None)
+        if len(cols) >= 9
+    ]
+
+
+def soup_commemorative(html):
+    blocks = []
+    for row in BeautifulSoup(html, 'html.parser').find_all('tr'):
+        img_cell = row.find('td', width="55%")
+        data_cell = row.find('td', width="40%")
+        if img_cell and data_cell and img_cell.find('img'):
+            denom_cell = data_cell.find('td', height="25")
+            blocks.append(denom_cell.get_text(strip=True) if denom_cell else '')
+    return blocks
+
+
+def stream_commemorative(html):
+    return [block['denomination'] for block in iter_stamp_blocks(html) if block['image_url']]
+
+
+def measure(func, html, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(html)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    func(html)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, best, peak
+
+
+def compare(label, html, baseline, streaming, repeat):
+    base_result, base_time, base_peak = measure(baseline, html, repeat)
+    new_result, new_time, new_peak = measure(streaming, html, repeat)
+    if len(base_result) != len(new_result):
+        print(f"  warning: BeautifulSoup found {len(base_result)} rows, streaming found {len(new_result)}")
+
+    print(f"{label} ({len(html) / 1024:.0f} KiB, {len(new_result)} rows)")
+    print(f"  BeautifulSoup: {base_time * 1000:8.1f} ms  peak {base_peak / 2**20:6.1f} MiB")
+    print(f"  Streaming:     {new_time * 1000:8.1f} ms  peak {new_peak / 2**20:6.1f} MiB")
+    print(f"  Speedup:       {base_time / new_time:8.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--yearly', nargs='*', default=[], help='Saved yearly table pages')
+    parser.add_argument('--commemorative', nargs='*', default=[], help='Saved commemorative pages')
+    parser.add_argument('--rows', type=int, default=2000, help='Rows in synthetic pages')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    yearly = [(path, open(path, encoding='utf-8').read()) for path in args.yearly]
+    commemorative = [(path, open(path, encoding='utf-8').read()) for path in args.commemorative]
+    if not (yearly or commemorative):
+        print("No saved pages given; benchmarking synthetic pages\n")
+        yearly = [('synthetic yearly page', synthetic_yearly_page(args.rows))]
+        commemorative = [('synthetic commemorative page', synthetic_commemorative_page(args.rows))]
+
+    for label, html in yearly:
+        compare(label, html, soup_yearly, stream_yearly, args.repeat)
+    for label, html in commemorative:
+        compare(label, html, soup_commemorative, stream_commemorative, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import unquote, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+MANIFEST_NAME = 'manifest.json'
+CHUNK_SIZE = 64 * 1024
+
+
+class ImageDownloader:
+    def __init__(self, folder='downloaded_stamps', max_workers=8, timeout=30, save_every=50):
+        """
+        Concurrent, resumable image downloader.
+
+        Files are stored under their SHA-256 digest, so the same image served
+        from different URLs is kept only once. A manifest in the target folder
+        maps every completed URL to its file and is used to skip finished
+        downloads on later runs.
+
+        :param folder: Directory to store images and the manifest in
+        :param max_workers: Number of concurrent downloads
+        :param timeout: Per-request timeout in seconds
+        :param save_every: Number of completed downloads between manifest writes
+        """
+        self.folder = folder
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.save_every = save_every
+        self._unsaved = 0
+        self.manifest_path = os.path.join(folder, MANIFEST_NAME)
+        self._lock = threading.Lock()
+
+        os.makedirs(folder, exist_ok=True)
+        self.manifest = self._load_manifest()
+
+        # One session shared by all workers, with a connection pool to match
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _load_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return {}
+        with open(self.manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _save_manifest(self):
+        # Caller holds the lock
+        self._unsaved = 0
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, indent=4, ensure_ascii=False)
+        os.replace(tmp_path, self.manifest_path)
+
+    def is_complete(self, url):
+        entry = self.manifest.get(url)
+        return bool(entry) and os.path.exists(os.path.join(self.folder, entry['file']))
+
+    def _download(self, url):
+        ext = os.path.splitext(unquote(urlparse(url).path))[1].lower()
+        fd, tmp_path = tempfile.mkstemp(dir=self.folder, suffix='.part')
+        digest = hashlib.sha256()
+        try:
+            # Stream to a temp file in chunks, hashing as we go
+            with os.fdopen(fd, 'wb') as f:
+                with self.session.get(url, stream=True, timeout=self.timeout) as response:
+                    response.raise_for_status()
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        f.write(chunk)
+                        digest.update(chunk)
+
+            sha256 = digest.hexdigest()
+            filename = f"{sha256}{ext}"
+            final_path = os.path.join(self.folder, filename)
+
+            with self._lock:
+                if os.path.exists(final_path):
+                    # Same content already stored under another URL
+                    os.remove(tmp_path)
+                else:
+                    os.replace(tmp_path, final_path)
+                self.manifest[url] = {'file': filename, 'sha256': sha256}
+                # Rewriting the manifest per file would be quadratic I/O
+                self._unsaved += 1
+                if self._unsaved >= self.save_every:
+                    self._save_manifest()
+            return filename
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def download_all(self, urls):
+        """
+        Download every URL not already recorded in the manifest.
+
+        :param urls: Iterable of image URLs (duplicates are ignored)
+        :return: Dict mapping each URL to its stored filename, or None if it failed
+        """
+        results = {}
+        pending = []
+        for url in dict.fromkeys(urls):
+            if self.is_complete(url):
+                results[url] = self.manifest[url]['file']
+            else:
+                pending.append(url)
+
+        if pending:
+            print(f"Downloading {len(pending)} images ({len(results)} already complete)")
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            futures = {executor.submit(self._download, url): url for url in pending}
+            for future in as_completed(futures):
+                url = futures[future]
+                try:
+                    results[url] = future.result()
+                except Exception as e:
+                    print(f"Error downloading {url}: {e}")
+                    results[url] = None
+        finally:
+            # On Ctrl-C, drop the queued downloads instead of running them all;
+            # the ones in progress finish and are recorded
+            executor.shutdown(cancel_futures=True)
+            # Persist whatever completed, even if the run was interrupted
+            with self._lock:
+                if self._unsaved:
+                    self._save_manifest()
+
+        return results
+
+    def close(self):
+        self.session.close()
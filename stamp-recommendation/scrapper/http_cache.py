@@ -0,0 +1,72 @@
+import hashlib
+import json
+import os
+
+import requests
+
+CACHE_DIR = '.http_cache'
+
+
+def _cache_paths(url, cache_dir):
+    key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+    return (os.path.join(cache_dir, f"{key}.body"),
+            os.path.join(cache_dir, f"{key}.json"))
+
+
+def _load_entry(url, cache_dir):
+    body_path, meta_path = _cache_paths(url, cache_dir)
+    if not (os.path.exists(body_path) and os.path.exists(meta_path)):
+        return None, None
+    with open(meta_path, 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    with open(body_path, 'rb') as f:
+        body = f.read()
+    return meta, body
+
+
+def _store_entry(url, cache_dir, response):
+    os.makedirs(cache_dir, exist_ok=True)
+    body_path, meta_path = _cache_paths(url, cache_dir)
+    meta = {
+        'url': url,
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+    }
+    # Write to temp files first so an interrupted run never leaves a body
+    # paired with validators from a different response
+    with open(body_path + '.tmp', 'wb') as f:
+        f.write(response.content)
+    with open(meta_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=4)
+    os.replace(body_path + '.tmp', body_path)
+    os.replace(meta_path + '.tmp', meta_path)
+
+
+def cached_get(url, cache_dir=CACHE_DIR, session=None, timeout=30):
+    """
+    Fetch a URL through an on-disk cache using conditional requests.
+
+    The ETag and Last-Modified validators of the previous response are sent as
+    If-None-Match / If-Modified-Since. A 304 reply is served from the cache.
+
+    Returns a tuple (content, changed) where changed is False when the cached
+    body was reused. Raises requests.RequestException on network/HTTP errors.
+    """
+    http = session or requests
+    meta, cached_body = _load_entry(url, cache_dir)
+
+    headers = {}
+    if meta:
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+
+    response = http.get(url, headers=headers, timeout=timeout)
+    if response.status_code == 304 and cached_body is not None:
+        return cached_body, False
+
+    response.raise_for_status()
+    if response.headers.get('ETag') or response.headers.get('Last-Modified'):
+        _store_entry(url, cache_dir, response)
+    return response.content, True
@@ -0,0 +1,259 @@
+import codecs
+from html.parser import HTMLParser
+
+CHUNK_SIZE = 64 * 1024
+
+
+def _joined_text(parts):
+    """Equivalent of BeautifulSoup's get_text(strip=True)."""
+    return ''.join(part.strip() for part in parts)
+
+
+def _iter_chunks(source, chunk_size):
+    if isinstance(source, (str, bytes)):
+        for i in range(0, len(source), chunk_size):
+            yield source[i:i + chunk_size]
+        return
+    while True:
+        chunk = source.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def _feed_chunks(parser, source, chunk_size=CHUNK_SIZE):
+    """
+    Feed a str/bytes page or a file-like object to an HTMLParser in chunks,
+    yielding completed items as they become available and stopping as soon as
+    the parser reports that nothing more is needed.
+    """
+    # Incremental decoding so multi-byte characters split across chunks survive
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    for chunk in _iter_chunks(source, chunk_size):
+        if isinstance(chunk, bytes):
+            chunk = decoder.decode(chunk)
+        parser.feed(chunk)
+        yield from parser.drain()
+        if parser.done:
+            return
+    parser.feed(decoder.decode(b'', final=True))
+    parser.close()
+    yield from parser.drain()
+
+
+class _StreamingParser(HTMLParser):
+    """
+    Base for the event-based parsers. HTMLParser may report one text node in
+    several pieces when it spans feed() chunks, so text is buffered until the
+    next tag and delivered whole to handle_text().
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.done = False
+        self._items = []
+        self._text = []
+
+    def drain(self):
+        items, self._items = self._items, []
+        return items
+
+    def _flush_text(self):
+        if self._text:
+            text = ''.join(self._text)
+            self._text = []
+            self.handle_text(text)
+
+    def handle_data(self, data):
+        self._text.append(data)
+
+    def handle_starttag(self, tag, attrs):
+        self._flush_text()
+        self.handle_start(tag, attrs)
+
+    def handle_startendtag(self, tag, attrs):
+        self._flush_text()
+        self.handle_start(tag, attrs)
+
+    def handle_endtag(self, tag):
+        self._flush_text()
+        self.handle_end(tag)
+
+    def close(self):
+        super().close()
+        self._flush_text()
+
+
+class TableRowParser(_StreamingParser):
+    """
+    Event-based parser that only materialises the rows of the first <table>.
+
+    Each row is a list of its <td> cells (header <th> cells are not counted,
+    like BeautifulSoup's row.find_all('td')), as dicts with:
+        'text':   raw cell text (same as BeautifulSoup's .text)
+        'spans':  attribute dicts of <span> elements in the cell
+        'links':  href values of <a> elements in the cell
+    Parsing stops once the table is closed, so the rest of the page is skipped.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.table_depth = 0
+        self.in_target = False
+        self.found_table = False
+        self.row = None
+        self.cell = None
+
+    def _close_cell(self):
+        if self.cell is not None:
+            self.cell['text'] = ''.join(self.cell.pop('parts'))
+            self.row.append(self.cell)
+            self.cell = None
+
+    def _close_row(self):
+        self._close_cell()
+        if self.row is not None:
+            self._items.append(self.row)
+            self.row = None
+
+    def handle_start(self, tag, attrs):
+        if self.done:
+            return
+        if tag == 'table':
+            self.table_depth += 1
+            if self.table_depth == 1:
+                self.in_target = True
+                self.found_table = True
+            return
+        if not self.in_target:
+            return
+
+        if tag == 'tr' and self.table_depth == 1:
+            # </tr> and </td> are optional in HTML
+            self._close_row()
+            self.row = []
+        elif tag in ('td', 'th') and self.row is not None and self.table_depth == 1:
+            # A new cell closes the previous one; only <td> cells are kept
+            self._close_cell()
+            if tag == 'td':
+                self.cell = {'attrs': dict(attrs), 'parts': [], 'spans': [], 'links': []}
+        elif self.cell is not None:
+            if tag == 'span':
+                self.cell['spans'].append(dict(attrs))
+            elif tag == 'a':
+                href = dict(attrs).get('href')
+                if href is not None:
+                    self.cell['links'].append(href)
+
+    def handle_end(self, tag):
+        if self.done or not self.in_target:
+            return
+        if tag == 'table':
+            self.table_depth -= 1
+            if self.table_depth == 0:
+                self._close_row()
+                self.in_target = False
+                self.done = True
+        elif self.table_depth == 1:
+            if tag == 'tr':
+                self._close_row()
+            elif tag in ('td', 'th'):
+                self._close_cell()
+
+    def handle_text(self, data):
+        if self.cell is not None:
+            self.cell['parts'].append(data)
+
+
+def iter_table_rows(source, chunk_size=CHUNK_SIZE, parser=None):
+    """
+    Yield the rows of the first table in a page, one list of cells per row.
+
+    :param parser: Optional TableRowParser to use, e.g. to check found_table
+                   afterwards
+    """
+    yield from _feed_chunks(parser or TableRowParser(), source, chunk_size)
+
+
+class StampBlockParser(_StreamingParser):
+    """
+    Event-based parser for the older commemorative stamp pages, where each stamp
+    is a row with an image cell (width="55%") and a details cell (width="40%").
+
+    Emits one dict per details cell with:
+        'image_url':    src of the first <img> in the preceding image cell
+        'paragraphs':   list of (text, bold_text) for each <p> in the details cell
+        'denomination': text of the nested td height="25", if any
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.td_stack = []
+        self.image_url = None
+        self.block = None
+        self.paragraph = None
+        self.bold = None
+        self.denomination = None
+
+    def _close_paragraph(self):
+        if self.paragraph is not None:
+            text, bold = self.paragraph
+            self.block['paragraphs'].append(
+                (_joined_text(text), _joined_text(bold) if bold is not None else None)
+            )
+            self.paragraph = None
+            self.bold = None
+
+    def handle_start(self, tag, attrs):
+        if tag == 'td':
+            width = dict(attrs).get('width')
+            height = dict(attrs).get('height')
+            if width == '55%':
+                self.td_stack.append('image')
+                self.image_url = None
+            elif width == '40%':
+                self.td_stack.append('data')
+                self.block = {'image_url': self.image_url, 'paragraphs': []}
+                self.denomination = None
+            elif height == '25' and self.block is not None and self.denomination is None:
+                self.td_stack.append('denomination')
+                self.denomination = []
+            else:
+                self.td_stack.append(None)
+        elif tag == 'img':
+            if 'image' in self.td_stack and self.image_url is None:
+                self.image_url = dict(attrs).get('src', '')
+        elif self.block is not None:
+            if tag == 'p':
+                self._close_paragraph()
+                self.paragraph = ([], None)
+            elif tag == 'b' and self.paragraph is not None and self.paragraph[1] is None:
+                self.paragraph = (self.paragraph[0], [])
+                self.bold = True
+
+    def handle_end(self, tag):
+        if tag == 'td' and self.td_stack:
+            kind = self.td_stack.pop()
+            if kind == 'data' and self.block is not None:
+                self._close_paragraph()
+                self.block['denomination'] = _joined_text(self.denomination or [])
+                self._items.append(self.block)
+                self.block = None
+                self.image_url = None
+        elif tag == 'p':
+            self._close_paragraph()
+        elif tag == 'b':
+            self.bold = None
+
+    def handle_text(self, data):
+        if self.paragraph is not None:
+            self.paragraph[0].append(data)
+            if self.bold:
+                self.paragraph[1].append(data)
+        if 'denomination' in self.td_stack:
+            self.denomination.append(data)
+
+
+def iter_stamp_blocks(source, chunk_size=CHUNK_SIZE):
+    """Yield one dict per stamp details cell on a commemorative stamp page."""
+    yield from _feed_chunks(StampBlockParser(), source, chunk_size)
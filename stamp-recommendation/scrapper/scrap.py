@@ -1,105 +1,199 @@
 import requests
-from bs4 import BeautifulSoup
+import hashlib
 import json
+from itertools import islice
 from urllib.parse import urljoin
 import os
 
-def scrape_stamps_data():
-    # URL of the webpage
-    url = "https://postagestamps.gov.in/newyearlycps24.aspx"
-    base_url = "https://postagestamps.gov.in/"
-    
-    # Send GET request
+from downloader import ImageDownloader
+from http_cache import CACHE_DIR, cached_get
+from parsing import TableRowParser, iter_table_rows
+
+URL = "https://postagestamps.gov.in/newyearlycps24.aspx"
+BASE_URL = "https://postagestamps.gov.in/"
+OUTPUT_FILE = '2024_stamps_data.jsonl'
+
+
+def row_key(sl_no, name):
+    """Identity of a catalogue row: serial number plus stamp name."""
+    return f"{sl_no}|{name}"
+
+
+def _image_urls(cell, base_url):
+    # Image names are listed in the imgnames attribute of span.linkToimage
+    for span in cell['spans']:
+        if 'linkToimage' in (span.get('class') or '').split():
+            names = (span.get('imgnames') or '').split(',')
+            return [urljoin(base_url, f"Uploads/{img.strip()}") for img in names]
+    return []
+
+
+def parse_stamp_row(cols, base_url=BASE_URL):
+    brochure_links = cols[8]['links']
+
+    return {
+        'sl_no': cols[0]['text'].strip(),
+        'name': cols[1]['text'].strip(),
+        'release_date': cols[2]['text'].strip(),
+        'denomination': cols[3]['text'].strip(),
+        'quantity': cols[4]['text'].strip(),
+        'printer': cols[5]['text'].strip(),
+        'stamp_images': _image_urls(cols[6], base_url),
+        'fdc_images': _image_urls(cols[7], base_url),
+        'brochure_pdf': urljoin(base_url, brochure_links[0]) if brochure_links else None
+    }
+
+
+def scrape_stamps_data(url=URL, base_url=BASE_URL, known_rows=None, cache_dir=CACHE_DIR,
+                       reuse_unmodified=True):
+    """
+    Scrape the yearly stamp table, parsing only new or changed rows.
+
+    :param known_rows: Mapping of row key -> row fingerprint from the previous run
+    :param reuse_unmodified: Skip parsing when the page is not modified. Pass
+                             False when known_rows lost rows the page may still have
+    :return: Tuple (changed_stamps, fingerprints) where fingerprints covers every
+             row on the page, or None on failure. Returns ([], known_rows) when
+             the server reports the page as not modified.
+    """
+    known_rows = known_rows or {}
+
+    # Send conditional GET request
     try:
-        response = requests.get(url)
-        response.raise_for_status()
+        content, modified = cached_get(url, cache_dir=cache_dir)
     except requests.RequestException as e:
         print(f"Error fetching the webpage: {e}")
         return None
 
-    # Parse HTML content
-    soup = BeautifulSoup(response.content, 'html.parser')
-    
-    # Find the table
-    table = soup.find('table')
-    if not table:
-        print("Table not found on the webpage")
-        return None
+    if not modified and known_rows and reuse_unmodified:
+        print("Page not modified since last scrape")
+        return [], known_rows
 
-    # List to store all stamps data
+    # List to store new or changed stamps
     stamps_data = []
-    
-    # Process each row
-    for row in table.find_all('tr')[1:]:  # Skip header row
-        cols = row.find_all('td')
+    fingerprints = {}
+    parser = TableRowParser()
+
+    # Stream rows of the first table only; the rest of the page is not parsed
+    for cols in islice(iter_table_rows(content, parser=parser), 1, None):  # Skip header row
         if len(cols) >= 9:  # Ensure row has all required columns
-            
-            # Extract image names from spans
-            stamp_img = cols[6].find('span', class_='linkToimage')
-            fdc_img = cols[7].find('span', class_='linkToimage')
-            brochure_link = cols[8].find('a')
-            
-            # Construct full image URLs
-            stamp_image_names = stamp_img.get('imgnames').split(',') if stamp_img else []
-            stamp_image_urls = [urljoin(base_url, f"Uploads/{img.strip()}") for img in stamp_image_names]
-            
-            fdc_image_names = fdc_img.get('imgnames').split(',') if fdc_img else []
-            fdc_image_urls = [urljoin(base_url, f"Uploads/{img.strip()}") for img in fdc_image_names]
-            
-            stamp_data = {
-                'sl_no': cols[0].text.strip(),
-                'name': cols[1].text.strip(),
-                'release_date': cols[2].text.strip(),
-                'denomination': cols[3].text.strip(),
-                'quantity': cols[4].text.strip(),
-                'printer': cols[5].text.strip(),
-                'stamp_images': stamp_image_urls,
-                'fdc_images': fdc_image_urls,
-                'brochure_pdf': urljoin(base_url, brochure_link.get('href')) if brochure_link else None
-            }
-            stamps_data.append(stamp_data)
-
-    return stamps_data
-
-def save_to_json(data, filename='2024_stamps_data.json'):
-    try:
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
-        print(f"Data successfully saved to {filename}")
-    except Exception as e:
-        print(f"Error saving data to JSON file: {e}")
+            key = row_key(cols[0]['text'].strip(), cols[1]['text'].strip())
+            fingerprint = hashlib.sha1(
+                json.dumps(cols, sort_keys=True).encode('utf-8')
+            ).hexdigest()
+            fingerprints[key] = fingerprint
+
+            # Skip building the record when the row content is unchanged
+            if known_rows.get(key) == fingerprint:
+                continue
+            stamps_data.append(parse_stamp_row(cols, base_url))
 
-def download_image(url, folder='downloaded_stamps'):
+    if not parser.found_table:
+        print("Table not found on the webpage")
+        return None
+
+    return stamps_data, fingerprints
+
+
+def load_jsonl(filename=OUTPUT_FILE, keys=None):
+    """
+    Load stamps from a JSONL file. Later lines override earlier ones with the
+    same row key, so the file can be appended to without rewriting it.
+
+    :param keys: Row keys currently on the page (e.g. the scrape fingerprints);
+                 stamps removed or renamed on the site are left out
+    """
+    stamps = {}
+    if not os.path.exists(filename):
+        return []
+    with open(filename, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                stamp = json.loads(line)
+            except json.JSONDecodeError:
+                # Partial last line of an interrupted write
+                continue
+            stamps[row_key(stamp['sl_no'], stamp['name'])] = stamp
+    if keys is not None:
+        return [stamp for key, stamp in stamps.items() if key in keys]
+    return list(stamps.values())
+
+
+def _has_partial_line(filename):
+    if not os.path.exists(filename) or not os.path.getsize(filename):
+        return False
+    with open(filename, 'rb') as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) != b'\n'
+
+
+def append_to_jsonl(data, filename=OUTPUT_FILE):
+    """Append stamps to a JSONL file. Returns True if every line was written."""
     try:
-        # Create folder if it doesn't exist
-        os.makedirs(folder, exist_ok=True)
-        
-        # Get filename from URL
-        filename = os.path.join(folder, url.split('/')[-1])
-        
-        # Download image
-        response = requests.get(url)
-        response.raise_for_status()
-        
-        # Save image
-        with open(filename, 'wb') as f:
-            f.write(response.content)
-        print(f"Successfully downloaded: {filename}")
-    except Exception as e:
-        print(f"Error downloading {url}: {e}")
+        partial = _has_partial_line(filename)
+        with open(filename, 'a', encoding='utf-8') as f:
+            # Terminate a partial last line so it does not swallow the next record
+            if partial:
+                f.write('\n')
+            for stamp in data:
+                f.write(json.dumps(stamp, ensure_ascii=False) + '\n')
+        print(f"Appended {len(data)} stamps to {filename}")
+        return True
+    except OSError as e:
+        print(f"Error appending data to JSONL file: {e}")
+        return False
+
+
+def load_fingerprints(filename):
+    if not os.path.exists(filename):
+        return {}
+    with open(filename, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_fingerprints(fingerprints, filename):
+    with open(filename + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(fingerprints, f, indent=4, ensure_ascii=False)
+    os.replace(filename + '.tmp', filename)
+
 
 def main():
-    # Scrape the data
-    stamps_data = scrape_stamps_data()
-    
-    if stamps_data:
-        # Save to JSON file
-        save_to_json(stamps_data)
-        
-        # Download all stamp images
-        # for stamp in stamps_data:
-        #     for img_url in stamp['stamp_images']:
-        #         download_image(img_url)
+    state_file = OUTPUT_FILE + '.state.json'
+
+    # Trust the state file only for rows still in the output, so rows lost
+    # from a deleted or truncated file are scraped again
+    stored = {row_key(stamp['sl_no'], stamp['name']) for stamp in load_jsonl()}
+    fingerprints = load_fingerprints(state_file)
+    known_rows = {key: fp for key, fp in fingerprints.items() if key in stored}
+
+    # Scrape only rows that are new or changed since the last run
+    result = scrape_stamps_data(
+        known_rows=known_rows, reuse_unmodified=len(known_rows) == len(fingerprints)
+    )
+
+    if result is not None:
+        stamps_data, fingerprints = result
+
+        # Append changes first and only then record them as seen, so a failed
+        # write leaves the rows to be re-parsed on the next run
+        if not stamps_data:
+            print("No new or changed stamps")
+        elif not append_to_jsonl(stamps_data):
+            return
+        save_fingerprints(fingerprints, state_file)
+
+        # Download all stamp and FDC images; completed ones are skipped
+        downloader = ImageDownloader()
+        try:
+            downloader.download_all(
+                url for stamp in load_jsonl(keys=fingerprints)
+                for url in stamp['stamp_images'] + stamp['fdc_images']
+            )
+        finally:
+            downloader.close()
 
 if __name__ == "__main__":
     main()
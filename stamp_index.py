@@ -0,0 +1,156 @@
+import argparse
+import json
+import os
+
+import numpy as np
+from PIL import Image
+
+from vision_cache import hamming_distances, perceptual_hash, prepare_image
+
+INDEX_PATH = "stamp_index.npz"
+
+
+def load_catalogue(paths):
+    """
+    Load scraped stamp records from JSON (list) or JSONL files.
+    stamp_images may be stored as a single URL or a list of URLs. Records are
+    keyed on sl_no + name across all files, later ones replacing earlier ones,
+    as the JSONL output of the scraper is append-only.
+    """
+    by_key = {}
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            if path.endswith(".jsonl"):
+                loaded = [json.loads(line) for line in f if line.strip()]
+            else:
+                loaded = json.load(f)
+        for record in loaded:
+            # The same stamp may be listed in several files (e.g. .json and .jsonl)
+            by_key[(record.get("sl_no"), record.get("name"))] = record
+
+    records = list(by_key.values())
+    for record in records:
+        images = record.get("stamp_images") or []
+        record["stamp_images"] = [images] if isinstance(images, str) else list(images)
+    return records
+
+
+class StampIndex:
+    def __init__(self, hashes, owners, records):
+        """
+        Nearest-neighbour index of catalogue stamp images
+
+        :param hashes: uint64 array of perceptual hashes, one per image
+        :param owners: int array mapping each hash to its record
+        :param records: Catalogue records (name, release_date, denomination, ...)
+        """
+        self.hashes = np.asarray(hashes, dtype=np.uint64)
+        self.owners = np.asarray(owners, dtype=np.int32)
+        self.records = records
+
+    def __len__(self):
+        return len(self.hashes)
+
+    @classmethod
+    def build(cls, records, image_folder):
+        """
+        Hash every downloaded stamp image of the catalogue.
+
+        Image files are located through the manifest written by the scraper's
+        ImageDownloader; records whose images were not downloaded are skipped.
+        """
+        with open(os.path.join(image_folder, "manifest.json"), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+
+        hashes, owners, kept = [], [], []
+        for record in records:
+            files = [manifest[url]["file"] for url in record["stamp_images"] if url in manifest]
+            record_hashes = []
+            for filename in files:
+                try:
+                    with Image.open(os.path.join(image_folder, filename)) as image:
+                        record_hashes.append(perceptual_hash(prepare_image(image)))
+                except (OSError, ValueError) as e:
+                    print(f"Skipping {filename}: {e}")
+            if record_hashes:
+                hashes.extend(record_hashes)
+                owners.extend([len(kept)] * len(record_hashes))
+                kept.append(record)
+        return cls(np.array(hashes, dtype=np.uint64), owners, kept)
+
+    def save(self, path=INDEX_PATH):
+        np.savez(
+            path,
+            hashes=self.hashes,
+            owners=self.owners,
+            records=np.array(json.dumps(self.records, ensure_ascii=False)),
+        )
+
+    @classmethod
+    def load(cls, path=INDEX_PATH):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["hashes"], data["owners"], json.loads(str(data["records"])))
+
+    def query(self, image, max_distance=8, min_margin=4):
+        """
+        Find the catalogue record matching an image.
+
+        A match is confident when the nearest hash is within max_distance bits
+        and the nearest hash of any other record is at least min_margin bits
+        further away.
+
+        :return: Tuple (record, distance), or (None, distance) on a miss
+        """
+        if len(self) == 0:
+            return None, None
+        if not isinstance(image, (int, np.integer)):
+            image = perceptual_hash(prepare_image(image))
+
+        distances = hamming_distances(self.hashes, image)
+        best = int(np.argmin(distances))
+        best_distance = int(distances[best])
+        others = distances[self.owners != self.owners[best]]
+        runner_up = int(others.min()) if len(others) else 64
+
+        if best_distance <= max_distance and runner_up - best_distance >= min_margin:
+            return self.records[self.owners[best]], best_distance
+        return None, best_distance
+
+    def identify(self, image):
+        """Return a JSON answer for a confident catalogue match, or None."""
+        record, _ = self.query(image)
+        return record_to_response(record) if record is not None else None
+
+
+def record_to_response(record):
+    """Format a catalogue record like the model's JSON answer."""
+    return json.dumps(
+        {
+            "name": record.get("name", ""),
+            "date_of_issue": record.get("release_date", ""),
+            "price": record.get("denomination", ""),
+            "description": "Identified from the local stamp catalogue.",
+        },
+        indent=4,
+        ensure_ascii=False,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the offline stamp image index")
+    parser.add_argument("catalogue", nargs="+", help="Scraped stamp JSON/JSONL files")
+    parser.add_argument(
+        "--images",
+        default="stamp-recommendation/scrapper/downloaded_stamps",
+        help="Folder of images downloaded by the scraper",
+    )
+    parser.add_argument("--output", default=INDEX_PATH)
+    args = parser.parse_args()
+
+    index = StampIndex.build(load_catalogue(args.catalogue), args.images)
+    index.save(args.output)
+    print(f"Indexed {len(index)} images of {len(index.records)} stamps into {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,9 @@ import pathlib
 import textwrap
 from PIL import Image
 
+from stamp_index import INDEX_PATH, StampIndex
+from vision_cache import STAMP_PROMPT, CachedVisionClient, ResponseCache
+
 
 import google.generativeai as genai
 
@@ -16,46 +19,25 @@ os.getenv("GOOGLE_API_KEY")
 genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
 
 
-def get_gemini_response(prompt, image):
+@st.cache_resource
+def get_vision_client(prompt):
+    # Built once per process instead of on every Streamlit rerun
     model = genai.GenerativeModel("gemini-1.5-flash")
-    if prompt != "":
-        response = model.generate_content([prompt, image])
-    else:
-        response = model.generate_content(image)
-    return response.text
+    # Offline catalogue index, built with `python stamp_index.py`
+    index = StampIndex.load() if os.path.exists(INDEX_PATH) else None
+    return CachedVisionClient(model, prompt, cache=ResponseCache(), index=index)
+
+
+def get_gemini_response(prompt, image):
+    response, _ = get_vision_client(prompt).generate(image)
+    return response
 
 
 st.set_page_config(page_title="Gemini Image Demo")
 
 st.header("Stamp Vision")
 # input=st.text_input("Input Prompt: ",key="input")
-prompt = """
-Analyze the uploaded image and identify if it is a valid stamp. If valid, perform the following tasks:
-
-Use global knowledge and external references to gather additional details about the stamp, including historical, cultural, or philatelic significance.
-
-- Name of the Stamp
-- Date of Issue
-- Price
-- Brief Description or Special Details (50 words at max)
-
-If the image is blurry or cannot be recognized as a stamp, respond with an error message indicating: 
-
-{"error": "Invalid image. Please try again."}
-
-Output Example (Valid Image):   
-{   "name": "Mahatma Gandhi Commemorative Stamp",   
-    "date_of_issue": "1948-08-15",   
-    "price": "10 Rupees",   
-    "description": "Issued to commemorate Mahatma Gandhi's contributions; features a portrait of Gandhi." 
-}     
-
-Output Example (Invalid Image):
-{   
-    "error": "Invalid image. Please try again." 
-}     
-
-Process the image carefully and ensure accurate information is extracted."""
+prompt = STAMP_PROMPT
 
 uploaded_file = st.file_uploader("Choose an image...", type=["jpg", "jpeg", "png"])
 image = ""
@@ -68,7 +50,9 @@ submit = st.button("Tell me about the image")
 
 ## If ask button is clicked
 
-if submit:
+if submit and uploaded_file is None:
+    st.error("Please upload an image first.")
+elif submit:
     response = get_gemini_response(prompt, image)
     st.subheader("The Response is")
     st.write(response)
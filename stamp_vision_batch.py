@@ -0,0 +1,230 @@
+from dotenv import load_dotenv
+
+load_dotenv()  # take environment variables from .env.
+
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from PIL import Image, UnidentifiedImageError
+
+import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+
+from stamp_index import INDEX_PATH, StampIndex
+from vision_cache import STAMP_PROMPT, CachedVisionClient, ResponseCache
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+RESULT_FIELDS = ("name", "date_of_issue", "price", "description")
+# HTTP status codes worth retrying: rate limiting and transient server errors
+RETRYABLE_CODES = (429, 500, 502, 503, 504)
+# Network failures: the REST transport (--api-endpoint) raises requests
+# exceptions, which are not subclasses of the built-in ConnectionError
+RETRYABLE_ERRORS = (
+    ConnectionError,
+    TimeoutError,
+    requests.ConnectionError,
+    requests.Timeout,
+    google_exceptions.RetryError,
+    google_exceptions.DeadlineExceeded,
+)
+# Images that cannot be read; retrying them on a later run would fail the same way
+DECODE_ERRORS = (UnidentifiedImageError, Image.DecompressionBombError, OSError)
+
+
+class RateLimiter:
+    def __init__(self, base_delay=1.0, max_delay=60.0):
+        """
+        Shared backoff state for all workers. When any request is rate limited,
+        every worker pauses until the cooldown has passed.
+        """
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self._resume_at = 0.0
+
+    def wait(self):
+        with self._lock:
+            delay = self._resume_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def backoff(self, attempt):
+        # Exponential backoff with jitter
+        delay = min(self.max_delay, self.base_delay * 2 ** attempt)
+        delay *= random.uniform(0.5, 1.0)
+        with self._lock:
+            self._resume_at = max(self._resume_at, time.monotonic() + delay)
+
+
+def is_retryable(error):
+    # google.api_core exceptions carry the HTTP status in .code
+    return getattr(error, "code", None) in RETRYABLE_CODES or isinstance(
+        error, RETRYABLE_ERRORS
+    )
+
+
+def parse_response(text):
+    """Extract the JSON object from a model answer, tolerating ```json fences."""
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end < start:
+        return {"error": "Unparseable response", "raw": text}
+    try:
+        data = json.loads(text[start : end + 1])
+    except json.JSONDecodeError:
+        return {"error": "Unparseable response", "raw": text}
+    if "error" in data:
+        return {"error": data["error"]}
+    return {field: data.get(field, "") for field in RESULT_FIELDS}
+
+
+def find_images(folder):
+    images = []
+    for root, _, files in os.walk(folder):
+        for filename in files:
+            if filename.lower().endswith(IMAGE_EXTENSIONS):
+                images.append(os.path.relpath(os.path.join(root, filename), folder))
+    return sorted(images)
+
+
+def load_checkpoint(output):
+    """
+    Files already finished in a previous run. Only model answers and images
+    that cannot be decoded are final; a file whose latest record is an API,
+    auth or network failure is processed again.
+    """
+    done = set()
+    if not os.path.exists(output):
+        return done
+    with open(output, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # Partial last line of an interrupted run
+                continue
+            if record.get("retry"):
+                done.discard(record["file"])
+            else:
+                done.add(record["file"])
+    return done
+
+
+class BatchStampVision:
+    def __init__(self, client, max_workers=4, max_retries=5, limiter=None):
+        """
+        Classify folders of stamp images with one shared vision client
+
+        :param client: CachedVisionClient used by every worker
+        :param max_workers: Maximum number of concurrent requests
+        :param max_retries: Retries per image on rate limits and transient errors
+        :param limiter: RateLimiter shared by the workers
+        """
+        self.client = client
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.limiter = limiter or RateLimiter()
+
+    def classify(self, image):
+        for attempt in range(self.max_retries + 1):
+            self.limiter.wait()
+            try:
+                text, _ = self.client.generate(image)
+                return parse_response(text)
+            except Exception as e:
+                if not is_retryable(e) or attempt == self.max_retries:
+                    raise
+                self.limiter.backoff(attempt)
+
+    def _classify_file(self, folder, relpath):
+        try:
+            with Image.open(os.path.join(folder, relpath)) as image:
+                image.load()
+        except DECODE_ERRORS as e:
+            return {"file": relpath, "error": str(e)}
+
+        try:
+            result = self.classify(image)
+        except Exception as e:
+            # API, auth and network failures (bad key, 403, wrong endpoint,
+            # retries exhausted) are not final; a resumed run tries them again
+            result = {"error": str(e), "retry": True}
+        return {"file": relpath, **result}
+
+    def run(self, folder, output):
+        """
+        Classify every image in folder, appending one JSON line per image to
+        output. Images already recorded in output are skipped.
+
+        :return: Number of images processed in this run
+        """
+        done = load_checkpoint(output)
+        pending = [path for path in find_images(folder) if path not in done]
+        print(f"{len(pending)} images to process ({len(done)} already done)")
+
+        processed = 0
+        written = set()
+        with open(output, "a", encoding="utf-8") as out:
+
+            def write(future):
+                nonlocal processed
+                record = future.result()
+                # One flushed line per image is the checkpoint for resuming
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+                written.add(future)
+                processed += 1
+                status = "error" if "error" in record else "ok"
+                print(f"[{processed}/{len(pending)}] {record['file']}: {status}")
+
+            executor = ThreadPoolExecutor(max_workers=self.max_workers)
+            futures = [executor.submit(self._classify_file, folder, path) for path in pending]
+            try:
+                for future in as_completed(futures):
+                    write(future)
+            finally:
+                # On Ctrl-C, cancel the queued images instead of classifying
+                # them all, and keep the answers of the requests in flight
+                executor.shutdown(cancel_futures=True)
+                for future in futures:
+                    if future not in written and future.done() and not future.cancelled():
+                        write(future)
+        return processed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Classify a folder of stamp images")
+    parser.add_argument("folder", help="Directory of .jpg/.jpeg/.png stamp images")
+    parser.add_argument("--output", default="stamp_vision_results.jsonl")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--max-retries", type=int, default=5)
+    parser.add_argument(
+        "--api-endpoint", help="Alternative Gemini REST endpoint, e.g. a local stub server"
+    )
+    parser.add_argument("--no-cache", action="store_true", help="Disable the response cache")
+    args = parser.parse_args()
+
+    if args.api_endpoint:
+        genai.configure(
+            api_key=os.getenv("GOOGLE_API_KEY", "stub"),
+            transport="rest",
+            client_options={"api_endpoint": args.api_endpoint},
+        )
+    else:
+        genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+
+    model = genai.GenerativeModel("gemini-1.5-flash")
+    index = StampIndex.load() if os.path.exists(INDEX_PATH) else None
+    cache = None if args.no_cache else ResponseCache()
+    client = CachedVisionClient(model, STAMP_PROMPT, cache=cache, index=index)
+
+    BatchStampVision(client, args.workers, args.max_retries).run(args.folder, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+import hashlib
+import sqlite3
+import threading
+import time
+
+import numpy as np
+from PIL import Image, ImageChops, ImageFilter, ImageOps
+
+# Longest side sent to the model; stamps stay legible well below this
+MAX_IMAGE_SIDE = 1024
+HASH_SIZE = 8
+HASH_HIGHFREQ_FACTOR = 4
+# Centred crops hashed besides the whole image, as a fraction cut from each side
+CROP_MARGINS = (0.025, 0.05, 0.075, 0.1)
+# Longest side of the copy the crop hashes are computed from
+CROP_HASH_SIDE = 256
+# Largest per-pixel difference from the corner colour still counted as background
+BACKGROUND_TOLERANCE = 24
+
+# Number of set bits in every byte value, for vectorised popcount
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+STAMP_PROMPT = """
+Analyze the uploaded image and identify if it is a valid stamp. If valid, perform the following tasks:
+
+Use global knowledge and external references to gather additional details about the stamp, including historical, cultural, or philatelic significance.
+
+- Name of the Stamp
+- Date of Issue
+- Price
+- Brief Description or Special Details (50 words at max)
+
+If the image is blurry or cannot be recognized as a stamp, respond with an error message indicating: 
+
+{"error": "Invalid image. Please try again."}
+
+Output Example (Valid Image):   
+{   "name": "Mahatma Gandhi Commemorative Stamp",   
+    "date_of_issue": "1948-08-15",   
+    "price": "10 Rupees",   
+    "description": "Issued to commemorate Mahatma Gandhi's contributions; features a portrait of Gandhi." 
+}     
+
+Output Example (Invalid Image):
+{   
+    "error": "Invalid image. Please try again." 
+}     
+
+Process the image carefully and ensure accurate information is extracted."""
+
+
+def prompt_version(prompt):
+    """Short stable identifier of a prompt, so editing it invalidates the cache."""
+    return hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:12]
+
+
+def prepare_image(image, max_side=MAX_IMAGE_SIDE):
+    """
+    Normalise an uploaded image before hashing and sending it to the model:
+    apply EXIF orientation, convert to RGB and downscale the longest side.
+    """
+    image = ImageOps.exif_transpose(image)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    if max(image.size) > max_side:
+        image = image.copy()
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+    return image
+
+
+def _dct_matrix(n):
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    matrix[0] /= np.sqrt(2.0)
+    return matrix
+
+
+_DCT = _dct_matrix(HASH_SIZE * HASH_HIGHFREQ_FACTOR)
+
+
+def perceptual_hash(image):
+    """
+    64-bit DCT perceptual hash (pHash) of an image.
+
+    The image is reduced to 32x32 greyscale and the lowest 8x8 DCT frequencies
+    are thresholded at their median, so re-encodes and resizes of the same
+    stamp land within a few bits of each other. Crops do not: cutting 5% off
+    each side moves the hash by 10-20 bits, see crop_hashes().
+    """
+    size = HASH_SIZE * HASH_HIGHFREQ_FACTOR
+    pixels = np.asarray(
+        image.convert("L").resize((size, size), Image.LANCZOS), dtype=np.float64
+    )
+    dct = _DCT @ pixels @ _DCT.T
+    low = dct[:HASH_SIZE, :HASH_SIZE].flatten()
+    bits = low > np.median(low[1:])
+    return int("".join("1" if bit else "0" for bit in bits), 2)
+
+
+def trim_background(image, tolerance=BACKGROUND_TOLERANCE):
+    """
+    Crop an image to its content, dropping a plain border (table, scanner bed)
+    in the colour of the top-left pixel. Returns the image unchanged if it is
+    all background.
+    """
+    background = Image.new(image.mode, image.size, image.getpixel((0, 0)))
+    diff = ImageChops.difference(image, background).convert("L")
+    # Erode the mask so noise and JPEG artefacts in the background are ignored
+    mask = diff.point(lambda v: 255 if v > tolerance else 0).filter(ImageFilter.MinFilter(3))
+    box = mask.getbbox()
+    return image.crop(box) if box else image
+
+
+def crop_hashes(image, margins=CROP_MARGINS):
+    """
+    Perceptual hashes of an image and of centred crops of it, both as given
+    and with the background trimmed.
+
+    A re-crop of the same stamp matches when one of its hashes is close to one
+    of the stored hashes: trimming covers crops that only change the
+    background around the stamp, and the centred crops cover crops that cut
+    up to the largest margin into the stamp itself. Crops cutting into one
+    side only are matched less reliably.
+    """
+    small = image.copy()
+    small.thumbnail((CROP_HASH_SIDE, CROP_HASH_SIDE), Image.LANCZOS)
+    hashes = []
+    for candidate in (small, trim_background(small)):
+        width, height = candidate.size
+        hashes.append(perceptual_hash(candidate))
+        for margin in margins:
+            dx, dy = round(width * margin), round(height * margin)
+            hashes.append(perceptual_hash(candidate.crop((dx, dy, width - dx, height - dy))))
+    return hashes
+
+
+def hamming_distances(hashes, query):
+    """Hamming distance between a uint64 query and every hash in a uint64 array."""
+    xor = np.bitwise_xor(hashes, np.uint64(query))
+    return _POPCOUNT[xor.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+
+def _to_signed(value):
+    # SQLite integers are signed 64-bit
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def _to_unsigned(value):
+    return value + (1 << 64) if value < 0 else value
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        path=".stamp_vision_cache.sqlite3",
+        ttl=30 * 24 * 3600,
+        max_entries=1000,
+        max_distance=6,
+    ):
+        """
+        Persistent cache of model responses keyed by perceptual hash and prompt version.
+        Every entry also stores the crop_hashes() of its image, so re-crops hit too.
+
+        :param path: SQLite database file
+        :param ttl: Seconds after which an entry expires
+        :param max_entries: Maximum number of entries; least recently used are evicted
+        :param max_distance: Maximum Hamming distance between any query and stored
+                             crop hash for a hit
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        # One connection may be shared by several worker threads
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                   phash INTEGER NOT NULL,
+                   prompt_version TEXT NOT NULL,
+                   response TEXT NOT NULL,
+                   created REAL NOT NULL,
+                   last_access REAL NOT NULL,
+                   PRIMARY KEY (phash, prompt_version)
+               )"""
+        )
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS crop_hashes (
+                   phash INTEGER NOT NULL,
+                   prompt_version TEXT NOT NULL,
+                   crop_hash INTEGER NOT NULL
+               )"""
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS crop_hashes_entry ON crop_hashes (phash, prompt_version)"
+        )
+        self.conn.commit()
+
+    def _expire(self, now):
+        self.conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+        self._drop_orphans()
+
+    def _drop_orphans(self):
+        self.conn.execute(
+            """DELETE FROM crop_hashes WHERE NOT EXISTS (
+                   SELECT 1 FROM responses r
+                   WHERE r.phash = crop_hashes.phash
+                     AND r.prompt_version = crop_hashes.prompt_version
+               )"""
+        )
+
+    def get(self, hashes, version):
+        """
+        Return the cached response closest to the query, or None on a miss.
+
+        :param hashes: crop_hashes() of the query image
+        """
+        with self._lock:
+            return self._get(hashes, version)
+
+    def _get(self, hashes, version):
+        now = time.time()
+        self._expire(now)
+        # Entries stored without crop hashes match on their own hash only
+        rows = self.conn.execute(
+            """SELECT r.phash, COALESCE(c.crop_hash, r.phash) FROM responses r
+               LEFT JOIN crop_hashes c
+                 ON c.phash = r.phash AND c.prompt_version = r.prompt_version
+               WHERE r.prompt_version = ?""",
+            (version,),
+        ).fetchall()
+        if not rows:
+            self.conn.commit()
+            return None
+
+        stored = np.array([_to_unsigned(crop_hash) for _, crop_hash in rows], dtype=np.uint64)
+        distances = np.min([hamming_distances(stored, query) for query in hashes], axis=0)
+        best = int(np.argmin(distances))
+        if distances[best] > self.max_distance:
+            self.conn.commit()
+            return None
+
+        key = rows[best][0]
+        self.conn.execute(
+            "UPDATE responses SET last_access = ? WHERE phash = ? AND prompt_version = ?",
+            (now, key, version),
+        )
+        response = self.conn.execute(
+            "SELECT response FROM responses WHERE phash = ? AND prompt_version = ?",
+            (key, version),
+        ).fetchone()[0]
+        self.conn.commit()
+        return response
+
+    def put(self, hashes, version, response):
+        """
+        Store a response under the crop_hashes() of its image; the first hash
+        (the whole image) is the entry's key.
+        """
+        with self._lock:
+            self._put(hashes, version, response)
+
+    def _put(self, hashes, version, response):
+        now = time.time()
+        self._expire(now)
+        key = _to_signed(hashes[0])
+        self.conn.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+            (key, version, response, now, now),
+        )
+        self.conn.execute(
+            "DELETE FROM crop_hashes WHERE phash = ? AND prompt_version = ?", (key, version)
+        )
+        self.conn.executemany(
+            "INSERT INTO crop_hashes VALUES (?, ?, ?)",
+            [(key, version, _to_signed(crop_hash)) for crop_hash in hashes],
+        )
+        # Size-bounded: drop the least recently used entries beyond the limit
+        self.conn.execute(
+            """DELETE FROM responses WHERE rowid IN (
+                   SELECT rowid FROM responses ORDER BY last_access DESC LIMIT -1 OFFSET ?
+               )""",
+            (self.max_entries,),
+        )
+        self._drop_orphans()
+        self.conn.commit()
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+
+class CachedVisionClient:
+    def __init__(self, model, prompt, cache=None, index=None):
+        """
+        Wrap a generative model so repeated uploads of the same stamp are served locally
+
+        :param model: Object with a generate_content() method returning a response
+                      with a .text attribute (genai.GenerativeModel or a local stub)
+        :param prompt: Analysis prompt sent with every image
+        :param cache: ResponseCache instance, or None to disable caching
+        :param index: StampIndex of catalogue images, consulted before the model
+        """
+        self.model = model
+        self.prompt = prompt
+        self.version = prompt_version(prompt)
+        self.cache = cache
+        self.index = index
+
+    def generate(self, image):
+        """
+        Return the model's text response for an image.
+
+        :return: Tuple (text, local) where local is True when no API call was made
+        """
+        image = prepare_image(image)
+
+        if self.index is not None:
+            identified = self.index.identify(perceptual_hash(image))
+            if identified is not None:
+                return identified, True
+
+        if self.cache is not None:
+            hashes = crop_hashes(image)
+            cached = self.cache.get(hashes, self.version)
+            if cached is not None:
+                return cached, True
+
+        if self.prompt != "":
+            response = self.model.generate_content([self.prompt, image])
+        else:
+            response = self.model.generate_content(image)
+        text = response.text
+
+        if self.cache is not None:
+            self.cache.put(hashes, self.version, text)
+        return text, False